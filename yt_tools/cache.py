@@ -0,0 +1,108 @@
+# cache.py - On-disk cache of channel/playlist metadata
+
+import hashlib
+import json
+import mmap
+import os
+import time
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+
+
+def cache_dir() -> Path:
+    """Directory holding cached metadata, honouring XDG_CACHE_HOME."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(Path.home(), ".cache")
+    return Path(base) / "yt-tools" / "meta"
+
+
+def _path(url: str, suffix: str = ".json") -> Path:
+    return cache_dir() / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}{suffix}"
+
+
+def get(url: str, ttl: float = DEFAULT_TTL_SECONDS) -> list[dict] | None:
+    """Return cached entries for a URL, or None if missing or older than ttl."""
+    path = _path(url)
+    try:
+        if time.time() - path.stat().st_mtime > ttl:
+            return None
+        with open(path, "rb") as f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def put(url: str, entries: list[dict]) -> None:
+    """Store entries for a URL, replacing any previous cache file.
+
+    Alongside the entries, a title index is written: every lower-cased title
+    on its own line in a .titles file, plus a .offsets array of each line's
+    starting byte (and the total length) for match_titles.
+    """
+    path = _path(url)
+    titles_path = _path(url, ".titles")
+    offsets_path = _path(url, ".offsets")
+    try:
+        # Drop the old index first so it can never describe other entries
+        for stale in (titles_path, offsets_path):
+            if stale.exists():
+                stale.unlink()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        offsets = array("i")
+        blob = bytearray()
+        for e in entries:
+            offsets.append(len(blob))
+            blob += e.get("title", "").lower().replace("\n", " ").encode("utf-8") + b"\n"
+        offsets.append(len(blob))
+        with open(titles_path, "wb") as f:
+            f.write(blob)
+        with open(offsets_path, "wb") as f:
+            offsets.tofile(f)
+    except OSError:
+        pass
+
+
+def match_titles(url: str, keywords: list[str], count: int) -> list[int] | None:
+    """Indices of cached entries whose title contains every keyword.
+
+    Each keyword is located with mmap.find over the title index, and match
+    positions are mapped back to entries by bisecting the offsets. Returns
+    None if there is no usable index for `count` entries.
+    """
+    try:
+        offsets = array("i")
+        with open(_path(url, ".offsets"), "rb") as f:
+            offsets.frombytes(f.read())
+        if len(offsets) != count + 1:
+            return None
+        with open(_path(url, ".titles"), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size != offsets[-1]:
+                return None
+            if size == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                matched = None
+                for kw in keywords:
+                    needle = kw.lower().encode("utf-8")
+                    hits = set()
+                    pos = mm.find(needle)
+                    while pos != -1:
+                        i = bisect_right(offsets, pos) - 1
+                        hits.add(i)
+                        # Skip to the next title; one hit per title is enough
+                        pos = mm.find(needle, offsets[i + 1])
+                    matched = hits if matched is None else matched & hits
+                    if not matched:
+                        return []
+    except (OSError, ValueError):
+        return None
+    return sorted(matched) if matched is not None else list(range(count))
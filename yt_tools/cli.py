@@ -2,20 +2,27 @@
 
 import argparse
 import os
+import subprocess
 import sys
+from contextlib import closing
+from itertools import islice
 
 from yt_tools.download import (
+    default_jobs,
     download_videos,
-    filter_videos,
+    find_videos,
     format_duration,
-    list_videos,
+    iter_filtered,
+    iter_videos,
 )
 from yt_tools.transcribe import (
     DEFAULT_CHUNK_SECONDS,
     DEFAULT_MODEL_REPO,
     DEFAULT_OVERLAP_SECONDS,
+    QUANTIZE_BITS,
     Spinner,
     download_audio_with_ytdlp,
+    prepare_local_wav,
     transcribe_audio,
     write_transcripts,
 )
@@ -30,11 +37,12 @@ def cmd_download(args):
     }
 
     print(f"Fetching videos from {args.url}...")
-    videos = list_videos(args.url)
-    videos = filter_videos(videos, filters)
-
     if args.max:
-        videos = videos[:args.max]
+        # Stream the listing so yt-dlp can be stopped as soon as --max matches are found
+        with closing(iter_videos(args.url, refresh=args.refresh)) as entries:
+            videos = list(islice(iter_filtered(entries, filters), args.max))
+    else:
+        videos = find_videos(args.url, filters, refresh=args.refresh)
 
     if not videos:
         print("No videos match the filters.")
@@ -47,19 +55,24 @@ def cmd_download(args):
 
     if args.download:
         print()
-        download_videos(videos, args.output, args.resolution)
+        download_videos(videos, args.output, args.resolution, args.jobs)
 
     return 0
 
 
 def cmd_transcribe(args):
     """Handle the transcribe subcommand."""
-    import shutil
-
     source = args.source
     outdir = args.outdir
     is_url = source.startswith("http://") or source.startswith("https://")
 
+    if not 0 <= args.overlap_seconds < args.chunk_seconds:
+        print(
+            "Error: --overlap-seconds must be at least 0 and less than --chunk-seconds",
+            file=sys.stderr,
+        )
+        return 1
+
     if is_url:
         print("Downloading audio with yt-dlp ...")
         wav_path, base_name = download_audio_with_ytdlp(source, outdir)
@@ -77,8 +90,11 @@ def cmd_transcribe(args):
         os.makedirs(outdir, exist_ok=True)
         base_name = os.path.splitext(os.path.basename(source))[0]
         dest_wav_path = os.path.join(outdir, f"{base_name}.wav")
-        if os.path.abspath(source) != os.path.abspath(dest_wav_path):
-            shutil.copyfile(source, dest_wav_path)
+        try:
+            prepare_local_wav(source, dest_wav_path)
+        except subprocess.CalledProcessError:
+            print(f"Error: ffmpeg could not convert {source} to 16kHz mono WAV", file=sys.stderr)
+            return 1
         wav_path = dest_wav_path
 
     with Spinner("Transcribing (first run downloads model)"):
@@ -87,9 +103,10 @@ def cmd_transcribe(args):
             model_repo=args.model,
             chunk_seconds=args.chunk_seconds,
             overlap_seconds=args.overlap_seconds,
+            quantize=args.quantize,
         )
 
-    text_path, json_path = write_transcripts(outdir, base_name, result)
+    text_path, json_path = write_transcripts(outdir, base_name, result, pretty=args.pretty)
 
     print(f"Saved transcript: {text_path}")
     print(f"Saved full JSON: {json_path}")
@@ -121,6 +138,8 @@ def main():
     dl_parser.add_argument("-n", "--max", type=int, help="Maximum number of videos")
     dl_parser.add_argument("-o", "--output", default="./downloads", help="Output directory")
     dl_parser.add_argument("-r", "--resolution", default="1080", help="Max resolution: 720, 1080, or best")
+    dl_parser.add_argument("-j", "--jobs", type=int, default=default_jobs(), help="Parallel downloads")
+    dl_parser.add_argument("--refresh", action="store_true", help="Ignore cached channel/playlist metadata")
     dl_parser.add_argument("--shorts", action="store_true", help="Include shorts (<=60s)")
     dl_parser.add_argument("--only-shorts", action="store_true", help="Only shorts")
     dl_parser.set_defaults(func=cmd_download)
@@ -137,6 +156,8 @@ def main():
     tr_parser.add_argument("--model", default=DEFAULT_MODEL_REPO, help="Parakeet-MLX model repo")
     tr_parser.add_argument("--chunk-seconds", type=float, default=DEFAULT_CHUNK_SECONDS, help="Chunk size")
     tr_parser.add_argument("--overlap-seconds", type=float, default=DEFAULT_OVERLAP_SECONDS, help="Overlap between chunks")
+    tr_parser.add_argument("--quantize", choices=list(QUANTIZE_BITS), default="none", help="Quantize model weights")
+    tr_parser.add_argument("--pretty", action="store_true", help="Indent the JSON transcript")
     tr_parser.set_defaults(func=cmd_transcribe)
 
     args = parser.parse_args()
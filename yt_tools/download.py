@@ -1,57 +1,143 @@
 # download.py - Download YouTube videos with keyword filtering
 
-import subprocess
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Iterable, Iterator
 
+from tqdm import tqdm
+from yt_dlp import YoutubeDL
+from yt_dlp.utils import DownloadError, YoutubeDLError
 
-def filter_videos(videos: list[dict], filters: dict) -> list[dict]:
-    """Apply filters to video list."""
-    result = []
+from yt_tools import cache
+
+
+def default_jobs() -> int:
+    """Default number of parallel downloads (capped to limit ffmpeg contention)."""
+    return min(os.cpu_count() or 1, 4)
+
+
+def iter_filtered(videos: Iterable[dict], filters: dict) -> Iterator[dict]:
+    """Lazily apply filters to a stream of videos."""
+    min_dur = filters.get("min_duration", 0)
+    max_dur = filters.get("max_duration")
+    keywords = [kw.lower() for kw in filters.get("keywords") or []]
 
     for v in videos:
-        try:
-            duration = float(v["duration"]) if v["duration"] != "NA" else 0
-        except (ValueError, TypeError):
-            duration = 0
+        d = v.get("duration")
+        duration = float(d) if d not in (None, "", "NA") else 0
 
-        min_dur = filters.get("min_duration", 0)
         if min_dur and duration <= min_dur:
             continue
-
-        max_dur = filters.get("max_duration")
         if max_dur and duration > max_dur:
             continue
 
-        title = v.get("title", "").lower()
-        if filters.get("keywords"):
-            if not all(kw.lower() in title for kw in filters["keywords"]):
+        if keywords:
+            title = v.get("title", "").lower()
+            if not all(kw in title for kw in keywords):
                 continue
 
-        result.append(v)
+        yield v
+
 
-    return result
+def filter_videos(videos: list[dict], filters: dict) -> list[dict]:
+    """Apply filters to video list."""
+    return list(iter_filtered(videos, filters))
 
 
-def list_videos(url: str) -> list[dict]:
-    """Fetch all videos from a channel/playlist."""
-    args = ["yt-dlp", "--flat-playlist", "--print", "%(id)s\t%(duration)s\t%(title)s", url]
-    result = subprocess.run(args, capture_output=True, text=True)
+def _iter_video_entries(entries: Iterable[dict]) -> Iterator[dict]:
+    """Yield video entries, descending lazily into nested playlists.
 
+    A channel home URL lists its tabs (Videos, Shorts, Live) as playlists of
+    their own; only the leaf entries inside them are videos.
+    """
+    for e in entries:
+        if not e:
+            continue
+        if e.get("_type") == "playlist" or "entries" in e:
+            yield from _iter_video_entries(e.get("entries") or [])
+        elif e.get("id"):
+            yield e
+
+
+def iter_videos(url: str, refresh: bool = False) -> Iterator[dict]:
+    """Stream videos from a channel/playlist as yt-dlp extracts them.
+
+    Playlist pages are fetched lazily, so closing the generator early stops
+    further requests. A failed page ends the listing early. The metadata
+    cache is only updated when the whole listing has been read.
+    """
+    if not refresh:
+        videos = cache.get(url)
+        if videos is not None:
+            yield from videos
+            return
+
+    ydl_opts = {
+        "extract_flat": "in_playlist",
+        "skip_download": True,
+        "quiet": True,
+        "no_warnings": True,
+    }
     videos = []
-    for line in result.stdout.strip().split("\n"):
-        if "\t" in line:
-            parts = line.split("\t", 2)
-            if len(parts) >= 3:
-                videos.append({
-                    "id": parts[0],
-                    "duration": parts[1],
-                    "title": parts[2],
-                })
-    return videos
-
-
-def download_videos(videos: list[dict], output_dir: str, resolution: str = "1080") -> None:
-    """Download videos by ID."""
+    with YoutubeDL(ydl_opts) as ydl:
+        try:
+            # process=False keeps playlist entries as a lazy generator
+            info = ydl.extract_info(url, download=False, process=False)
+            while info.get("_type") in ("url", "url_transparent"):
+                info = ydl.extract_info(
+                    info["url"], download=False, ie_key=info.get("ie_key"), process=False
+                )
+            for e in _iter_video_entries([info]):
+                v = {
+                    "id": e["id"],
+                    "duration": e.get("duration") or "NA",
+                    "title": e.get("title") or "",
+                }
+                videos.append(v)
+                yield v
+        except YoutubeDLError as e:
+            # Later pages are fetched while iterating, so errors can surface
+            # here too; end the listing and leave the cache untouched.
+            if not isinstance(e, DownloadError):
+                print(f"Warning: video listing incomplete: {getattr(e, 'orig_msg', None) or e}", file=sys.stderr)
+            return
+    cache.put(url, videos)
+
+
+def list_videos(url: str, refresh: bool = False) -> list[dict]:
+    """Fetch all videos from a channel/playlist, using the metadata cache unless refresh is set."""
+    return list(iter_videos(url, refresh))
+
+
+def find_videos(url: str, filters: dict, refresh: bool = False) -> list[dict]:
+    """Fetch all videos from a channel/playlist and apply filters.
+
+    When the list comes from the metadata cache, keyword matching is narrowed
+    first with the cached title index, so only candidate videos are checked
+    individually. A freshly fetched list may be a partial listing that the
+    index does not describe, so it is always filtered in full.
+    """
+    videos = None if refresh else cache.get(url)
+    from_cache = videos is not None
+    if not from_cache:
+        videos = list_videos(url, refresh=True)
+    keywords = [kw for kw in filters.get("keywords") or [] if kw]
+    if keywords and from_cache:
+        indices = cache.match_titles(url, keywords, len(videos))
+        if indices is not None:
+            videos = [videos[i] for i in indices]
+    return filter_videos(videos, filters)
+
+
+def download_videos(
+    videos: list[dict],
+    output_dir: str,
+    resolution: str = "1080",
+    jobs: int | None = None,
+) -> None:
+    """Download videos by ID, split into batches across up to `jobs` worker threads."""
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
 
@@ -62,17 +148,50 @@ def download_videos(videos: list[dict], output_dir: str, resolution: str = "1080
     else:
         fmt = f"bestvideo[height<={resolution}][vcodec^=avc1]+bestaudio[ext=m4a]/bestvideo[height<={resolution}][vcodec^=avc1]+bestaudio/best[height<={resolution}][vcodec^=avc1]"
 
+    def download_batch(batch: list[dict], bar: tqdm) -> int:
+        # One YoutubeDL instance per batch, so extractor setup is paid once
+        # per worker; post_hooks fire once each video is merged and in place.
+        done = 0
+
+        def on_finished(filename: str) -> None:
+            nonlocal done
+            done += 1
+            tqdm.write(f"Downloaded: {Path(filename).stem[:70]}")
+            bar.update(1)
+
+        ydl_opts = {
+            "format": fmt,
+            "merge_output_format": "mp4",
+            "outtmpl": f"{output_path}/%(title)s.%(ext)s",
+            "quiet": True,
+            "noprogress": True,
+            "no_warnings": True,
+            "ignoreerrors": "only_download",
+            "post_hooks": [on_finished],
+        }
+        urls = [f"https://www.youtube.com/watch?v={v['id']}" for v in batch]
+        with YoutubeDL(ydl_opts) as ydl:
+            ydl.download(urls)
+        return done
+
+    # Videos with the same title share an output file, so they must go to the
+    # same worker; yt-dlp then skips the later ones as already downloaded.
+    # casefold() because macOS file systems are case-insensitive.
+    groups: dict[str, list[dict]] = {}
     for v in videos:
-        video_url = f"https://www.youtube.com/watch?v={v['id']}"
-        args = [
-            "yt-dlp",
-            "-f", fmt,
-            "--merge-output-format", "mp4",
-            "-o", f"{output_path}/%(title)s.%(ext)s",
-            video_url
-        ]
-        print(f"Downloading: {v['title'][:70]}...")
-        subprocess.run(args)
+        groups.setdefault(v["title"].casefold(), []).append(v)
+
+    jobs = max(1, min(jobs or default_jobs(), len(groups)))
+    batches: list[list[dict]] = [[] for _ in range(jobs)]
+    for group in groups.values():
+        min(batches, key=len).extend(group)
+    with ThreadPoolExecutor(max_workers=jobs) as pool, \
+            tqdm(total=len(videos), unit="video", desc="Downloading") as bar:
+        futures = [pool.submit(download_batch, batch, bar) for batch in batches]
+        done = sum(future.result() for future in as_completed(futures))
+
+    if done < len(videos):
+        print(f"{len(videos) - done} of {len(videos)} downloads failed.")
 
 
 def format_duration(seconds: float) -> str:
@@ -1,15 +1,15 @@
 # transcribe.py - Transcribe YouTube videos or local audio files
 
-import json
+import functools
 import os
 import shutil
+import subprocess
 import sys
+import tempfile
 import threading
-import time
-from dataclasses import asdict, is_dataclass
-from itertools import cycle
 from typing import Optional, Tuple
 
+import orjson
 from tqdm import tqdm
 from yt_dlp import YoutubeDL
 
@@ -21,11 +21,15 @@ except Exception:
 DEFAULT_MODEL_REPO = "mlx-community/parakeet-tdt-0.6b-v2"
 DEFAULT_CHUNK_SECONDS = 120.0
 DEFAULT_OVERLAP_SECONDS = 15.0
+JSON_WRITE_BUFFER = 1 << 20
+QUANTIZE_BITS = {"none": None, "int8": 8, "int4": 4}
 
 
-def ensure_ffmpeg_available() -> None:
-    """Ensure ffmpeg is installed and available on PATH."""
-    if shutil.which("ffmpeg") is None:
+@functools.cache
+def ensure_ffmpeg_available() -> str:
+    """Ensure ffmpeg is installed and available on PATH, returning its path."""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
         print(
             "Error: ffmpeg is required but not found on PATH.\n"
             "On macOS: brew install ffmpeg\n"
@@ -33,6 +37,7 @@ def ensure_ffmpeg_available() -> None:
             file=sys.stderr,
         )
         sys.exit(1)
+    return ffmpeg
 
 
 def download_audio_with_ytdlp(
@@ -43,7 +48,7 @@ def download_audio_with_ytdlp(
     audio_channels: int = 1,
 ) -> Tuple[str, str]:
     """Download a YouTube video's audio as a WAV file using yt-dlp."""
-    ensure_ffmpeg_available()
+    ffmpeg = ensure_ffmpeg_available()
     os.makedirs(output_directory, exist_ok=True)
 
     progress_holder: dict[str, Optional[tqdm]] = {"bar": None}
@@ -60,13 +65,14 @@ def download_audio_with_ytdlp(
                     unit_scale=True,
                     desc="Downloading",
                     leave=True,
+                    mininterval=0.1,
                 )
             bar = progress_holder["bar"]
             if bar is not None:
                 if total and bar.total != total:
                     bar.total = total
-                bar.n = downloaded
-                bar.refresh()
+                # update() redraws at most every mininterval, unlike refresh()
+                bar.update(downloaded - bar.n)
         elif status == "finished":
             bar = progress_holder.get("bar")
             if bar is not None:
@@ -83,6 +89,7 @@ def download_audio_with_ytdlp(
         "quiet": True,
         "noprogress": True,
         "noplaylist": True,
+        "ffmpeg_location": ffmpeg,
         "restrictfilenames": True,
         "outtmpl": os.path.join(output_directory, "%(title)s.%(ext)s"),
         "postprocessors": [
@@ -106,78 +113,214 @@ def download_audio_with_ytdlp(
     return wav_path, base_name
 
 
+def prepare_local_wav(
+    source: str,
+    dest_path: str,
+    sample_rate_hz: int = 16000,
+    audio_channels: int = 1,
+) -> None:
+    """Place a local WAV at dest_path in the format the transcriber expects.
+
+    Files already at the target rate and channel count are hard-linked (or
+    symlinked, or as a last resort copied); anything else is converted with
+    ffmpeg in a single pass into a temporary file that then replaces dest_path,
+    so a failed conversion leaves any existing dest_path untouched.
+    """
+    import soundfile as sf
+
+    # source may be a link to (or the same file as) dest_path; never remove it
+    if os.path.exists(dest_path) and os.path.samefile(source, dest_path):
+        return
+
+    try:
+        info = sf.info(source)
+        matches = info.samplerate == sample_rate_hz and info.channels == audio_channels
+    except Exception:
+        matches = False
+
+    if matches:
+        if os.path.lexists(dest_path):
+            os.remove(dest_path)
+        try:
+            os.link(source, dest_path)
+            return
+        except OSError:
+            pass
+        try:
+            os.symlink(os.path.abspath(source), dest_path)
+            return
+        except OSError:
+            pass
+        shutil.copyfile(source, dest_path)
+        return
+
+    ffmpeg = ensure_ffmpeg_available()
+    fd, tmp_path = tempfile.mkstemp(
+        suffix=".wav", dir=os.path.dirname(os.path.abspath(dest_path))
+    )
+    os.close(fd)
+    try:
+        subprocess.run(
+            [
+                ffmpeg, "-nostdin", "-loglevel", "error", "-y",
+                "-i", source,
+                "-ar", str(sample_rate_hz),
+                "-ac", str(audio_channels),
+                tmp_path,
+            ],
+            check=True,
+        )
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def iter_audio_chunks(audio_path: str, chunk_frames: int, step_frames: int):
+    """Yield (start_frame, samples) windows read from disk one chunk at a time."""
+    import soundfile as sf
+
+    with sf.SoundFile(audio_path) as f:
+        total = f.frames
+        for start in range(0, total, step_frames):
+            f.seek(start)
+            yield start, f.read(min(chunk_frames, total - start), dtype="float32")
+            if start + chunk_frames >= total:
+                break
+
+
 def transcribe_audio(
     audio_path: str,
     model_repo: str = DEFAULT_MODEL_REPO,
     chunk_seconds: float = DEFAULT_CHUNK_SECONDS,
     overlap_seconds: float = DEFAULT_OVERLAP_SECONDS,
+    quantize: str = "none",
 ):
-    """Transcribe an audio file with Parakeet-MLX and return the result object."""
+    """Transcribe an audio file with Parakeet-MLX and return the result object.
+
+    16kHz mono WAVs are read chunk by chunk instead of being loaded whole, so
+    memory use stays constant regardless of the recording length.
+
+    Weights load as bfloat16; quantize="int8" or "int4" additionally quantizes
+    the linear layers, trading a small accuracy loss for less memory traffic.
+    """
+    import mlx.core as mx
+    import mlx.nn as nn
+    import soundfile as sf
     from parakeet_mlx import from_pretrained
+    from parakeet_mlx.alignment import (
+        merge_longest_common_subsequence,
+        merge_longest_contiguous,
+        sentences_to_result,
+        tokens_to_sentences,
+    )
+    from parakeet_mlx.audio import get_logmel
+
+    if not 0 <= overlap_seconds < chunk_seconds:
+        raise ValueError(
+            f"overlap_seconds ({overlap_seconds}) must be >= 0 and less than "
+            f"chunk_seconds ({chunk_seconds})"
+        )
 
     model = from_pretrained(model_repo)
     model.encoder.set_attention_model("rel_pos_local_attn", (256, 256))
 
-    result = model.transcribe(
-        audio_path,
-        chunk_duration=chunk_seconds,
-        overlap_duration=overlap_seconds,
-    )
-    return result
+    bits = QUANTIZE_BITS[quantize]
+    if bits is not None:
+        nn.quantize(
+            model,
+            group_size=64,
+            bits=bits,
+            class_predicate=lambda _, m: isinstance(m, nn.Linear) and m.weight.shape[-1] % 64 == 0,
+        )
+
+    config = model.preprocessor_config
+    info = sf.info(audio_path)
+    if info.samplerate != config.sample_rate or info.channels != 1:
+        # Needs resampling/downmixing, which Parakeet's own loader handles
+        return model.transcribe(
+            audio_path,
+            chunk_duration=chunk_seconds,
+            overlap_duration=overlap_seconds,
+        )
+
+    chunk_frames = int(chunk_seconds * config.sample_rate)
+    step_frames = chunk_frames - int(overlap_seconds * config.sample_rate)
+
+    all_tokens = []
+    for start, samples in iter_audio_chunks(audio_path, chunk_frames, step_frames):
+        if len(samples) < config.hop_length:
+            break
+        mel = get_logmel(mx.array(samples), config)
+        chunk_tokens = model.generate(mel)[0].tokens
+
+        offset = start / config.sample_rate
+        for token in chunk_tokens:
+            token.start += offset
+            token.end = token.start + token.duration
+
+        if all_tokens:
+            try:
+                all_tokens = merge_longest_contiguous(
+                    all_tokens, chunk_tokens, overlap_duration=overlap_seconds
+                )
+            except RuntimeError:
+                all_tokens = merge_longest_common_subsequence(
+                    all_tokens, chunk_tokens, overlap_duration=overlap_seconds
+                )
+        else:
+            all_tokens = chunk_tokens
+
+    return sentences_to_result(tokens_to_sentences(all_tokens))
 
 
 def write_transcripts(
     output_directory: str,
     base_name: str,
     result,
+    pretty: bool = False,
 ) -> Tuple[str, str]:
-    """Write .txt and .json transcripts to the specified output directory."""
+    """Write .txt and .json transcripts to the specified output directory.
+
+    The JSON is compact unless pretty is set, in which case it is indented.
+    """
     text_path = os.path.join(output_directory, f"{base_name}.txt")
     json_path = os.path.join(output_directory, f"{base_name}.json")
 
     with open(text_path, "w", encoding="utf-8") as f:
         f.write(result.text)
 
-    with open(json_path, "w", encoding="utf-8") as jf:
-        json.dump(to_jsonable(result), jf, ensure_ascii=False, indent=2)
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    if pretty:
+        option |= orjson.OPT_INDENT_2
+    with open(json_path, "wb", buffering=JSON_WRITE_BUFFER) as jf:
+        jf.write(orjson.dumps(result, option=option, default=_orjson_default))
 
     return text_path, json_path
 
 
-def to_jsonable(obj):
-    """Recursively convert an object to a JSON-serializable structure."""
-    if obj is None or isinstance(obj, (bool, int, float, str)):
-        return obj
-    if isinstance(obj, (list, tuple, set)):
-        return [to_jsonable(x) for x in obj]
-    if isinstance(obj, dict):
-        return {str(k): to_jsonable(v) for k, v in obj.items()}
-    if is_dataclass(obj):
-        return to_jsonable(asdict(obj))
-    if np is not None:
-        try:
-            if isinstance(obj, np.generic):
-                return obj.item()
-            if isinstance(obj, np.ndarray):
-                return obj.tolist()
-        except Exception:
-            pass
+def _orjson_default(obj):
+    """Convert the few types orjson cannot serialize natively."""
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if np is not None and isinstance(obj, np.generic):
+        return obj.item()
     to_dict = getattr(obj, "to_dict", None)
     if callable(to_dict):
         try:
-            return to_jsonable(to_dict())
+            return to_dict()
         except Exception:
             pass
     if hasattr(obj, "__dict__"):
-        try:
-            return {k: to_jsonable(v) for k, v in vars(obj).items() if not k.startswith("_")}
-        except Exception:
-            pass
+        return {k: v for k, v in vars(obj).items() if not k.startswith("_")}
     return repr(obj)
 
 
 class Spinner:
-    """Simple CLI spinner as a context manager."""
+    """Simple CLI spinner as a context manager (animated only on a TTY)."""
+
+    frames = ("|", "/", "-", "\\")
+    interval = 0.25
 
     def __init__(self, message: str = "Working") -> None:
         self.message = message
@@ -185,16 +328,21 @@ class Spinner:
         self._thread: Optional[threading.Thread] = None
 
     def _run(self) -> None:
-        for ch in cycle("|/-\\"):
-            if self._stop_event.is_set():
-                break
-            print(f"\r{self.message} {ch}", end="", flush=True)
-            time.sleep(0.1)
-        print("\r" + " " * (len(self.message) + 2) + "\r", end="", flush=True)
+        i = 0
+        while not self._stop_event.is_set():
+            sys.stderr.write(f"\r{self.message} {self.frames[i % len(self.frames)]}")
+            sys.stderr.flush()
+            i += 1
+            self._stop_event.wait(self.interval)
+        sys.stderr.write("\r" + " " * (len(self.message) + 2) + "\r")
+        sys.stderr.flush()
 
     def __enter__(self):
-        self._thread = threading.Thread(target=self._run, daemon=True)
-        self._thread.start()
+        if sys.stderr.isatty():
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        else:
+            print(f"{self.message}...", file=sys.stderr)
         return self
 
     def __exit__(self, exc_type, exc, tb):